@@ -2,7 +2,6 @@
 Hospital Management System - Main Application
 Flask-based HMS with Admin, Doctor, and Patient roles
 """
-from flask import Flask, g
 from flask import Flask, render_template, redirect, url_for, flash, request
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -16,13 +15,19 @@ from blueprints.patient import patient_bp
 from blueprints.auth import auth_bp
 
 # Import database and models
-from database import init_db, get_db
+from database import init_db, close_db, cache, DATABASE
 from models import User
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-change-in-production'
-app.config['DATABASE'] = 'hospital.db'
+app.config['DATABASE'] = DATABASE
+
+# Process-local cache for rarely changing lookups such as departments
+cache.init_app(app, config={'CACHE_TYPE': 'SimpleCache'})
+
+# Hand each request's database connection back to the pool, even on errors
+app.teardown_appcontext(close_db)
 
 # Initialize Login Manager
 login_manager = LoginManager()
@@ -32,13 +37,8 @@ login_manager.login_view = 'auth.login'
 
 @login_manager.user_loader
 def load_user(user_id):
-    db = get_db()
-    cursor = db.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
-    user_data = cursor.fetchone()
-    if user_data:
-        return User(user_data['user_id'], user_data['name'], user_data['email'],
-                    user_data['password'], user_data['role'])
-    return None
+    # The session carries the signed user id, role and name, so no query is needed
+    return User.from_session_id(user_id)
 
 
 # Register blueprints
@@ -61,19 +61,16 @@ def index():
     return redirect(url_for('auth.login'))
 
 
-@app.teardown_appcontext
-def close_connection(exception):
-    """Close database connection"""
-    db = getattr(g, '_database', None)
-    if db is not None:
-        db.close()
-
-
 if __name__ == '__main__':
-    # Initialize database on first run
-    if not os.path.exists('hospital.db'):
-        print("Creating database and tables...")
-        init_db()
+    # init_db is idempotent, so running it on every start also brings existing
+    # databases up to the current schema. DATABASE may be a file: URI, so a
+    # first run is told by init_db seeding the database, not by the path.
+    if init_db():
         print("Database initialized successfully!")
 
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    if os.environ.get('FLASK_DEBUG') == '1':
+        app.run(debug=True, port=5000)
+    else:
+        # Multi-threaded WSGI server; the Flask dev server is for debugging only
+        from waitress import serve
+        serve(app, host='127.0.0.1', port=5000, threads=8)
\ No newline at end of file
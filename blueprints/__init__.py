@@ -0,0 +1,53 @@
+"""
+Helpers shared by the blueprints
+blueprints/__init__.py
+"""
+
+from flask import g, request
+from datetime import date, timedelta
+
+
+def today_iso():
+    """Today's date as YYYY-MM-DD, computed once per request"""
+    if 'today' not in g:
+        g.today = date.today().isoformat()
+    return g.today
+
+
+def week_later_iso():
+    """The date seven days from today as YYYY-MM-DD, computed once per request"""
+    if 'week_later' not in g:
+        g.week_later = (date.today() + timedelta(days=7)).isoformat()
+    return g.week_later
+
+
+def keyset_page(db, sql_first, sql_page, params, per_page):
+    """Fetch one newest-first page of appointments by keyset pagination
+
+    sql_first takes params + (limit,); sql_page takes params followed by the
+    before_date, before_time and before_id of the request's cursor, then the
+    limit. Returns (rows, next_cursor, is_first_page), where next_cursor holds
+    the query arguments of the next older page, or None on the last page.
+    """
+    before_date = request.args.get('before_date')
+    before_time = request.args.get('before_time')
+    before_id = request.args.get('before_id', type=int)
+
+    # Fetch one row past the page to learn whether an older page exists
+    limit = per_page + 1
+    is_first_page = not (before_date and before_time and before_id)
+    if is_first_page:
+        rows = db.execute(sql_first, (*params, limit)).fetchall()
+    else:
+        rows = db.execute(sql_page, (*params, before_date, before_time, before_id, limit)).fetchall()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = {
+            'before_date': last['appointment_date'],
+            'before_time': last['appointment_time'],
+            'before_id': last['appointment_id'],
+        }
+    return rows, next_cursor, is_first_page
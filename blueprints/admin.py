@@ -6,12 +6,127 @@ blueprints/admin.py
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
 from functools import wraps
-from werkzeug.security import generate_password_hash
-from database import get_db
-from datetime import datetime, timedelta
+from database import get_db, get_departments, active_doctors, cache
+from blueprints import keyset_page
+from models import hash_password
+from datetime import date, timedelta
 
 admin_bp = Blueprint('admin', __name__)
 
+# SQL for the dashboard and list views, built once at import so every
+# request hands sqlite3 the same string for its statement cache
+SQL_DASHBOARD_COUNTS = '''
+    SELECT (SELECT COUNT(*) FROM doctors WHERE status = 'active') AS doctors_count,
+           (SELECT COUNT(*) FROM patients WHERE status = 'active') AS patients_count,
+           (SELECT COUNT(*) FROM appointments) AS appointments_count
+'''
+
+SQL_RECENT_APPOINTMENTS = '''
+    SELECT a.*,
+           u1.name AS patient_name,
+           u2.name AS doctor_name,
+           doc.specialization
+    FROM appointments a
+    JOIN patients p ON a.patient_id = p.patient_id
+    JOIN users u1 ON p.user_id = u1.user_id
+    JOIN doctors doc ON a.doctor_id = doc.doctor_id
+    JOIN users u2 ON doc.user_id = u2.user_id
+    ORDER BY a.appointment_date DESC, a.appointment_time DESC
+    LIMIT 10
+'''
+
+SQL_APPOINTMENT_STATUS_STATS = '''
+    SELECT status, COUNT(*) as count
+    FROM appointments
+    GROUP BY status
+'''
+
+SQL_DOCTORS_SEARCH = '''
+    SELECT d.*, u.name, u.email, u.status as user_status, dept.name as dept_name
+    FROM doctors d
+    JOIN users u ON d.user_id = u.user_id
+    LEFT JOIN departments dept ON d.dept_id = dept.dept_id
+    WHERE d.user_id IN (SELECT rowid FROM users_fts WHERE name LIKE ?)
+       OR d.doctor_id IN (SELECT rowid FROM doctors_fts WHERE specialization LIKE ?)
+    ORDER BY u.name
+'''
+
+SQL_DOCTORS_LIST = '''
+    SELECT d.*, u.name, u.email, u.status as user_status, dept.name as dept_name
+    FROM doctors d
+    JOIN users u ON d.user_id = u.user_id
+    LEFT JOIN departments dept ON d.dept_id = dept.dept_id
+    ORDER BY u.name
+'''
+
+SQL_DOCTOR_DETAIL = '''
+    SELECT d.*, u.name, u.email, u.status as user_status
+    FROM doctors d
+    JOIN users u ON d.user_id = u.user_id
+    WHERE d.doctor_id = ?
+'''
+
+SQL_PATIENTS_SEARCH = '''
+    SELECT p.*, u.name, u.email, u.status as user_status
+    FROM patients p
+    JOIN users u ON p.user_id = u.user_id
+    WHERE p.user_id IN (SELECT rowid FROM users_fts WHERE name LIKE ?)
+       OR p.patient_id IN (SELECT rowid FROM patients_fts WHERE contact LIKE ?)
+       OR p.patient_id LIKE ?
+    ORDER BY u.name
+'''
+
+SQL_PATIENTS_LIST = '''
+    SELECT p.*, u.name, u.email, u.status as user_status
+    FROM patients p
+    JOIN users u ON p.user_id = u.user_id
+    ORDER BY u.name
+'''
+
+SQL_PATIENT_DETAIL = '''
+    SELECT p.*, u.name, u.email, u.status as user_status
+    FROM patients p
+    JOIN users u ON p.user_id = u.user_id
+    WHERE p.patient_id = ?
+'''
+
+SQL_APPOINTMENTS_LIST = '''
+    SELECT a.*,
+           u1.name as patient_name, p.contact as patient_contact,
+           u2.name as doctor_name, doc.specialization,
+           dept.name as dept_name
+    FROM appointments a
+    JOIN patients p ON a.patient_id = p.patient_id
+    JOIN users u1 ON p.user_id = u1.user_id
+    JOIN doctors doc ON a.doctor_id = doc.doctor_id
+    JOIN users u2 ON doc.user_id = u2.user_id
+    LEFT JOIN departments dept ON doc.dept_id = dept.dept_id
+    ORDER BY a.appointment_date DESC, a.appointment_time DESC, a.appointment_id DESC
+    LIMIT ?
+'''
+
+# Same as SQL_APPOINTMENTS_LIST, continuing after the keyset of the last row shown
+SQL_APPOINTMENTS_PAGE = '''
+    SELECT a.*,
+           u1.name as patient_name, p.contact as patient_contact,
+           u2.name as doctor_name, doc.specialization,
+           dept.name as dept_name
+    FROM appointments a
+    JOIN patients p ON a.patient_id = p.patient_id
+    JOIN users u1 ON p.user_id = u1.user_id
+    JOIN doctors doc ON a.doctor_id = doc.doctor_id
+    JOIN users u2 ON doc.user_id = u2.user_id
+    LEFT JOIN departments dept ON doc.dept_id = dept.dept_id
+    WHERE (a.appointment_date, a.appointment_time, a.appointment_id) < (?, ?, ?)
+    ORDER BY a.appointment_date DESC, a.appointment_time DESC, a.appointment_id DESC
+    LIMIT ?
+'''
+
+APPOINTMENTS_PAGE_SIZE = 50
+
+# Availability slots every new doctor starts with, for each of the next 7 days
+DEFAULT_TIME_SLOTS = (('09:00', '12:00'), ('14:00', '17:00'))
+
 
 def admin_required(f):
     """Decorator to require admin role"""
@@ -33,38 +148,19 @@ def dashboard():
     """Admin dashboard with statistics"""
     db = get_db()
 
-    # Get counts
-    doctors_count = db.execute('SELECT COUNT(*) as count FROM doctors WHERE status = "active"').fetchone()['count']
-    patients_count = db.execute('SELECT COUNT(*) as count FROM patients WHERE status = "active"').fetchone()['count']
-    appointments_count = db.execute('SELECT COUNT(*) as count FROM appointments').fetchone()['count']
+    # Get counts in a single round trip
+    counts = db.execute(SQL_DASHBOARD_COUNTS).fetchone()
 
     # Recent appointments
-    recent_appointments = db.execute('''
-        SELECT a.*, 
-               u1.name AS patient_name, 
-               u2.name AS doctor_name, 
-               doc.specialization
-        FROM appointments a
-        JOIN patients p ON a.patient_id = p.patient_id
-        JOIN users u1 ON p.user_id = u1.user_id
-        JOIN doctors doc ON a.doctor_id = doc.doctor_id
-        JOIN users u2 ON doc.user_id = u2.user_id
-        JOIN departments d ON doc.dept_id = d.dept_id
-        ORDER BY a.appointment_date DESC, a.appointment_time DESC
-        LIMIT 10
-    ''').fetchall()
+    recent_appointments = db.execute(SQL_RECENT_APPOINTMENTS).fetchall()
 
     # Appointments by status
-    status_stats = db.execute('''
-        SELECT status, COUNT(*) as count
-        FROM appointments
-        GROUP BY status
-    ''').fetchall()
+    status_stats = db.execute(SQL_APPOINTMENT_STATUS_STATS).fetchall()
 
     return render_template('admin/dashboard.html',
-                           doctors_count=doctors_count,
-                           patients_count=patients_count,
-                           appointments_count=appointments_count,
+                           doctors_count=counts['doctors_count'],
+                           patients_count=counts['patients_count'],
+                           appointments_count=counts['appointments_count'],
                            recent_appointments=recent_appointments,
                            status_stats=status_stats)
 
@@ -78,22 +174,9 @@ def doctors():
     search = request.args.get('search', '')
 
     if search:
-        doctors_list = db.execute('''
-            SELECT d.*, u.name, u.email, u.status as user_status, dept.name as dept_name
-            FROM doctors d
-            JOIN users u ON d.user_id = u.user_id
-            LEFT JOIN departments dept ON d.dept_id = dept.dept_id
-            WHERE u.name LIKE ? OR d.specialization LIKE ?
-            ORDER BY u.name
-        ''', (f'%{search}%', f'%{search}%')).fetchall()
+        doctors_list = db.execute(SQL_DOCTORS_SEARCH, (f'%{search}%', f'%{search}%')).fetchall()
     else:
-        doctors_list = db.execute('''
-            SELECT d.*, u.name, u.email, u.status as user_status, dept.name as dept_name
-            FROM doctors d
-            JOIN users u ON d.user_id = u.user_id
-            LEFT JOIN departments dept ON d.dept_id = dept.dept_id
-            ORDER BY u.name
-        ''').fetchall()
+        doctors_list = db.execute(SQL_DOCTORS_LIST).fetchall()
 
     return render_template('admin/doctors.html', doctors=doctors_list, search=search)
 
@@ -110,7 +193,7 @@ def add_doctor():
         email = request.form.get('email')
         password = request.form.get('password')
         specialization = request.form.get('specialization')
-        dept_id = request.form.get('dept_id')
+        dept_id = request.form.get('dept_id') or None
         contact = request.form.get('contact')
         qualification = request.form.get('qualification')
         experience = request.form.get('experience')
@@ -118,19 +201,29 @@ def add_doctor():
         # Validation
         if not all([name, email, password, specialization]):
             flash('Please fill in all required fields', 'danger')
-            departments = db.execute('SELECT * FROM departments ORDER BY name').fetchall()
+            departments = get_departments()
             return render_template('admin/add_doctor.html', departments=departments)
 
-        # Check if email exists
-        existing = db.execute('SELECT * FROM users WHERE email = ?', (email,)).fetchone()
-        if existing:
+        # Check the email is free and the department exists in one query
+        checks = db.execute('''
+            SELECT EXISTS(SELECT 1 FROM users WHERE email = ?) AS email_taken,
+                   ? IS NULL OR EXISTS(SELECT 1 FROM departments WHERE dept_id = ?) AS dept_ok
+        ''', (email, dept_id, dept_id)).fetchone()
+        if checks['email_taken']:
             flash('Email already exists', 'danger')
-            departments = db.execute('SELECT * FROM departments ORDER BY name').fetchall()
+            departments = get_departments()
+            return render_template('admin/add_doctor.html', departments=departments)
+        if not checks['dept_ok']:
+            flash('Selected department does not exist', 'danger')
+            departments = get_departments()
             return render_template('admin/add_doctor.html', departments=departments)
 
         try:
             # Create user
-            hashed_password = generate_password_hash(password)
+            hashed_password = hash_password(password)
+
+            # Take the write lock up front rather than at the first INSERT
+            db.execute('BEGIN IMMEDIATE')
             cursor = db.execute('''
                 INSERT INTO users (name, email, password, role, status)
                 VALUES (?, ?, ?, ?, ?)
@@ -139,24 +232,28 @@ def add_doctor():
             user_id = cursor.lastrowid
 
             # Create doctor record
-            db.execute('''
+            doc_cursor = db.execute('''
                 INSERT INTO doctors (user_id, specialization, dept_id, contact, qualification, experience, status)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
             ''', (user_id, specialization, dept_id, contact, qualification, experience, 'active'))
 
-            doctor_id = cursor.lastrowid
-
-            # Add default availability for next 7 days
-            for i in range(7):
-                date = (datetime.now() + timedelta(days=i)).strftime('%Y-%m-%d')
-                time_slots = [('09:00', '12:00'), ('14:00', '17:00')]
-                for start, end in time_slots:
-                    db.execute('''
-                        INSERT INTO doctor_availability (doctor_id, date, start_time, end_time, is_available)
-                        VALUES (?, ?, ?, ?, ?)
-                    ''', (doctor_id, date, start, end, 1))
+            doctor_id = doc_cursor.lastrowid
+
+            # Add default availability for next 7 days in a single batch
+            today = date.today()
+            dates = [(today + timedelta(days=i)).isoformat() for i in range(7)]
+            availability_rows = [
+                (doctor_id, day, start, end, 1)
+                for day in dates
+                for start, end in DEFAULT_TIME_SLOTS
+            ]
+            db.executemany('''
+                INSERT INTO doctor_availability (doctor_id, date, start_time, end_time, is_available)
+                VALUES (?, ?, ?, ?, ?)
+            ''', availability_rows)
 
             db.commit()
+            cache.delete_memoized(active_doctors)
             flash('Doctor added successfully!', 'success')
             return redirect(url_for('admin.doctors'))
 
@@ -164,7 +261,7 @@ def add_doctor():
             db.rollback()
             flash(f'Error adding doctor: {str(e)}', 'danger')
 
-    departments = db.execute('SELECT * FROM departments ORDER BY name').fetchall()
+    departments = get_departments()
     return render_template('admin/add_doctor.html', departments=departments)
 
 
@@ -179,30 +276,33 @@ def edit_doctor(doctor_id):
         name = request.form.get('name')
         email = request.form.get('email')
         specialization = request.form.get('specialization')
-        dept_id = request.form.get('dept_id')
+        dept_id = request.form.get('dept_id') or None
         contact = request.form.get('contact')
         qualification = request.form.get('qualification')
         experience = request.form.get('experience')
         status = request.form.get('status')
 
         try:
-            # Get doctor's user_id
-            doctor = db.execute('SELECT user_id FROM doctors WHERE doctor_id = ?', (doctor_id,)).fetchone()
-
-            # Update user
+            db.execute('BEGIN IMMEDIATE')
+            # Update user, resolving the doctor's user_id inside the statement
             db.execute('''
                 UPDATE users SET name = ?, email = ?, status = ?
-                WHERE user_id = ?
-            ''', (name, email, status, doctor['user_id']))
+                WHERE user_id = (SELECT user_id FROM doctors WHERE doctor_id = ?)
+            ''', (name, email, status, doctor_id))
 
             # Update doctor
-            db.execute('''
+            updated = db.execute('''
                 UPDATE doctors SET specialization = ?, dept_id = ?, contact = ?, 
                 qualification = ?, experience = ?, status = ?
                 WHERE doctor_id = ?
-            ''', (specialization, dept_id, contact, qualification, experience, status, doctor_id))
+            ''', (specialization, dept_id, contact, qualification, experience, status, doctor_id)).rowcount
+            if not updated:
+                db.rollback()
+                flash('Doctor not found.', 'danger')
+                return redirect(url_for('admin.doctors'))
 
             db.commit()
+            cache.delete_memoized(active_doctors)
             flash('Doctor updated successfully!', 'success')
             return redirect(url_for('admin.doctors'))
 
@@ -210,14 +310,9 @@ def edit_doctor(doctor_id):
             db.rollback()
             flash(f'Error updating doctor: {str(e)}', 'danger')
 
-    doctor = db.execute('''
-        SELECT d.*, u.name, u.email, u.status as user_status
-        FROM doctors d
-        JOIN users u ON d.user_id = u.user_id
-        WHERE d.doctor_id = ?
-    ''', (doctor_id,)).fetchone()
+    doctor = db.execute(SQL_DOCTOR_DETAIL, (doctor_id,)).fetchone()
 
-    departments = db.execute('SELECT * FROM departments ORDER BY name').fetchall()
+    departments = get_departments()
     return render_template('admin/edit_doctor.html', doctor=doctor, departments=departments)
 
 
@@ -228,13 +323,19 @@ def delete_doctor(doctor_id):
     """Delete/blacklist doctor"""
     db = get_db()
     try:
-        doctor = db.execute('SELECT user_id FROM doctors WHERE doctor_id = ?', (doctor_id,)).fetchone()
-
+        db.execute('BEGIN IMMEDIATE')
         # Update status to blacklisted
-        db.execute('UPDATE users SET status = ? WHERE user_id = ?', ('blacklisted', doctor['user_id']))
-        db.execute('UPDATE doctors SET status = ? WHERE doctor_id = ?', ('blacklisted', doctor_id))
+        db.execute('UPDATE users SET status = ? WHERE user_id = (SELECT user_id FROM doctors WHERE doctor_id = ?)',
+                   ('blacklisted', doctor_id))
+        updated = db.execute('UPDATE doctors SET status = ? WHERE doctor_id = ?',
+                             ('blacklisted', doctor_id)).rowcount
+        if not updated:
+            db.rollback()
+            flash('Doctor not found.', 'danger')
+            return redirect(url_for('admin.doctors'))
 
         db.commit()
+        cache.delete_memoized(active_doctors)
         flash('Doctor has been blacklisted', 'success')
     except Exception as e:
         db.rollback()
@@ -252,20 +353,9 @@ def patients():
     search = request.args.get('search', '')
 
     if search:
-        patients_list = db.execute('''
-            SELECT p.*, u.name, u.email, u.status as user_status
-            FROM patients p
-            JOIN users u ON p.user_id = u.user_id
-            WHERE u.name LIKE ? OR p.contact LIKE ? OR p.patient_id LIKE ?
-            ORDER BY u.name
-        ''', (f'%{search}%', f'%{search}%', f'%{search}%')).fetchall()
+        patients_list = db.execute(SQL_PATIENTS_SEARCH, (f'%{search}%', f'%{search}%', f'%{search}%')).fetchall()
     else:
-        patients_list = db.execute('''
-            SELECT p.*, u.name, u.email, u.status as user_status
-            FROM patients p
-            JOIN users u ON p.user_id = u.user_id
-            ORDER BY u.name
-        ''').fetchall()
+        patients_list = db.execute(SQL_PATIENTS_LIST).fetchall()
 
     return render_template('admin/patients.html', patients=patients_list, search=search)
 
@@ -289,16 +379,21 @@ def edit_patient(patient_id):
         status = request.form.get('status')
 
         try:
-            patient = db.execute('SELECT user_id FROM patients WHERE patient_id = ?', (patient_id,)).fetchone()
-
-            db.execute('UPDATE users SET name = ?, email = ?, status = ? WHERE user_id = ?',
-                       (name, email, status, patient['user_id']))
-
+            db.execute('BEGIN IMMEDIATE')
             db.execute('''
+                UPDATE users SET name = ?, email = ?, status = ?
+                WHERE user_id = (SELECT user_id FROM patients WHERE patient_id = ?)
+            ''', (name, email, status, patient_id))
+
+            updated = db.execute('''
                 UPDATE patients SET age = ?, gender = ?, contact = ?, address = ?,
                 blood_group = ?, emergency_contact = ?, status = ?
                 WHERE patient_id = ?
-            ''', (age, gender, contact, address, blood_group, emergency_contact, status, patient_id))
+            ''', (age, gender, contact, address, blood_group, emergency_contact, status, patient_id)).rowcount
+            if not updated:
+                db.rollback()
+                flash('Patient not found.', 'danger')
+                return redirect(url_for('admin.patients'))
 
             db.commit()
             flash('Patient updated successfully!', 'success')
@@ -308,12 +403,7 @@ def edit_patient(patient_id):
             db.rollback()
             flash(f'Error: {str(e)}', 'danger')
 
-    patient = db.execute('''
-        SELECT p.*, u.name, u.email, u.status as user_status
-        FROM patients p
-        JOIN users u ON p.user_id = u.user_id
-        WHERE p.patient_id = ?
-    ''', (patient_id,)).fetchone()
+    patient = db.execute(SQL_PATIENT_DETAIL, (patient_id,)).fetchone()
 
     return render_template('admin/edit_patient.html', patient=patient)
 
@@ -325,10 +415,15 @@ def delete_patient(patient_id):
     """Delete/blacklist patient"""
     db = get_db()
     try:
-        patient = db.execute('SELECT user_id FROM patients WHERE patient_id = ?', (patient_id,)).fetchone()
-
-        db.execute('UPDATE users SET status = ? WHERE user_id = ?', ('blacklisted', patient['user_id']))
-        db.execute('UPDATE patients SET status = ? WHERE patient_id = ?', ('blacklisted', patient_id))
+        db.execute('BEGIN IMMEDIATE')
+        db.execute('UPDATE users SET status = ? WHERE user_id = (SELECT user_id FROM patients WHERE patient_id = ?)',
+                   ('blacklisted', patient_id))
+        updated = db.execute('UPDATE patients SET status = ? WHERE patient_id = ?',
+                             ('blacklisted', patient_id)).rowcount
+        if not updated:
+            db.rollback()
+            flash('Patient not found.', 'danger')
+            return redirect(url_for('admin.patients'))
 
         db.commit()
         flash('Patient has been blacklisted', 'success')
@@ -343,25 +438,16 @@ def delete_patient(patient_id):
 @login_required
 @admin_required
 def appointments():
-    """View all appointments"""
+    """View all appointments, newest first, one page at a time"""
     db = get_db()
 
-    appointments_list = db.execute('''
-        SELECT a.*, 
-               u1.name as patient_name, p.contact as patient_contact,
-               u2.name as doctor_name, doc.specialization,
-               dept.name as dept_name
-        FROM appointments a
-        JOIN patients p ON a.patient_id = p.patient_id
-        JOIN users u1 ON p.user_id = u1.user_id
-        JOIN doctors doc ON a.doctor_id = doc.doctor_id
-        JOIN users u2 ON doc.user_id = u2.user_id
-        JOIN departments d ON doc.dept_id = d.dept_id
-        LEFT JOIN departments dept ON doc.dept_id = dept.dept_id
-        ORDER BY a.appointment_date DESC, a.appointment_time DESC
-    ''').fetchall()
-
-    return render_template('admin/appointments.html', appointments=appointments_list)
+    appointments_list, next_cursor, is_first_page = keyset_page(
+        db, SQL_APPOINTMENTS_LIST, SQL_APPOINTMENTS_PAGE, (), APPOINTMENTS_PAGE_SIZE)
+
+    return render_template('admin/appointments.html',
+                           appointments=appointments_list,
+                           next_cursor=next_cursor,
+                           is_first_page=is_first_page)
 
 
 @admin_bp.route('/appointment/update/<int:appointment_id>', methods=['POST'])
@@ -5,9 +5,8 @@ blueprints/auth.py
 
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
 from database import get_db
-from models import User
+from models import User, hash_password, verify_password, password_needs_rehash
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -27,17 +26,35 @@ def login():
             return render_template('auth/login.html')
 
         db = get_db()
-        cursor = db.execute('SELECT * FROM users WHERE email = ?', (email,))
+        # Doctor/patient ids are fetched here once and then carried in the session
+        cursor = db.execute('''
+            SELECT u.*, d.doctor_id, p.patient_id
+            FROM users u
+            LEFT JOIN doctors d ON d.user_id = u.user_id
+            LEFT JOIN patients p ON p.user_id = u.user_id
+            WHERE u.email = ?
+            LIMIT 1
+        ''', (email,))
         user_data = cursor.fetchone()
 
-        if user_data and check_password_hash(user_data['password'], password):
+        # Unknown emails are checked against a dummy hash so timing stays uniform
+        password_ok = verify_password(user_data['password'] if user_data else None, password)
+
+        if user_data and password_ok:
             # Check if user is blacklisted
             if user_data['status'] == 'blacklisted':
                 flash('Your account has been suspended. Please contact admin.', 'danger')
                 return render_template('auth/login.html')
 
+            # Upgrade legacy werkzeug hashes to Argon2id on successful login
+            if password_needs_rehash(user_data['password']):
+                db.execute('UPDATE users SET password = ? WHERE user_id = ?',
+                           (hash_password(password), user_data['user_id']))
+                db.commit()
+
             user = User(user_data['user_id'], user_data['name'], user_data['email'],
-                        user_data['password'], user_data['role'])
+                        user_data['password'], user_data['role'],
+                        doctor_id=user_data['doctor_id'], patient_id=user_data['patient_id'])
             login_user(user)
 
             # Redirect based on role
@@ -87,14 +104,17 @@ def register():
         db = get_db()
 
         # Check if email already exists
-        cursor = db.execute('SELECT * FROM users WHERE email = ?', (email,))
+        cursor = db.execute('SELECT 1 FROM users WHERE email = ? LIMIT 1', (email,))
         if cursor.fetchone():
             flash('Email already registered', 'danger')
             return render_template('auth/register.html')
 
         try:
             # Create user
-            hashed_password = generate_password_hash(password)
+            hashed_password = hash_password(password)
+
+            # Take the write lock up front rather than at the first INSERT
+            db.execute('BEGIN IMMEDIATE')
             cursor = db.execute('''
                 INSERT INTO users (name, email, password, role, status)
                 VALUES (?, ?, ?, ?, ?)
@@ -6,11 +6,121 @@ blueprints/doctor.py
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
 from functools import wraps
-from database import get_db
-from datetime import datetime, timedelta
+from blueprints import keyset_page, today_iso, week_later_iso
+from database import get_db, active_doctors, cache
+from datetime import date, timedelta
 
 doctor_bp = Blueprint('doctor', __name__)
 
+# SQL for the views below, built once at import so every request hands
+# sqlite3 the same string for its statement cache
+SQL_DASHBOARD_UPCOMING = '''
+    SELECT a.*, u.name as patient_name, p.contact, p.age, p.gender
+    FROM appointments a
+    JOIN patients p ON a.patient_id = p.patient_id
+    JOIN users u ON p.user_id = u.user_id
+    WHERE a.doctor_id = ? AND a.appointment_date >= ? AND a.appointment_date <= ?
+    AND a.status != 'Cancelled'
+    ORDER BY a.appointment_date, a.appointment_time
+'''
+
+SQL_ASSIGNED_PATIENTS = '''
+    SELECT dp.patient_id, u.name, p.age, p.gender, p.contact, p.blood_group,
+           dp.total_appointments
+    FROM doctor_patients dp
+    JOIN patients p ON dp.patient_id = p.patient_id
+    JOIN users u ON p.user_id = u.user_id
+    WHERE dp.doctor_id = ?
+    ORDER BY u.name
+'''
+
+SQL_DASHBOARD_STATS = '''
+    SELECT COUNT(*) AS total,
+           COALESCE(SUM(CASE WHEN status = 'Completed' THEN 1 ELSE 0 END), 0) AS completed,
+           COALESCE(SUM(CASE WHEN status = 'Booked' AND appointment_date >= ? THEN 1 ELSE 0 END), 0) AS pending
+    FROM appointments
+    WHERE doctor_id = ?
+'''
+
+SQL_APPOINTMENTS_LIST = '''
+    SELECT a.*, u.name as patient_name, p.contact, p.age, p.gender, p.blood_group
+    FROM appointments a
+    JOIN patients p ON a.patient_id = p.patient_id
+    JOIN users u ON p.user_id = u.user_id
+    WHERE a.doctor_id = ?
+    ORDER BY a.appointment_date DESC, a.appointment_time DESC, a.appointment_id DESC
+    LIMIT ?
+'''
+
+# Same as SQL_APPOINTMENTS_LIST, continuing after the keyset of the last row shown
+SQL_APPOINTMENTS_PAGE = '''
+    SELECT a.*, u.name as patient_name, p.contact, p.age, p.gender, p.blood_group
+    FROM appointments a
+    JOIN patients p ON a.patient_id = p.patient_id
+    JOIN users u ON p.user_id = u.user_id
+    WHERE a.doctor_id = ?
+      AND (a.appointment_date, a.appointment_time, a.appointment_id) < (?, ?, ?)
+    ORDER BY a.appointment_date DESC, a.appointment_time DESC, a.appointment_id DESC
+    LIMIT ?
+'''
+
+SQL_UPDATE_APPOINTMENT_STATUS = '''
+    UPDATE appointments SET status = ?, updated_at = CURRENT_TIMESTAMP
+    WHERE appointment_id = ?
+'''
+
+SQL_UPSERT_TREATMENT = '''
+    INSERT INTO treatments (appointment_id, diagnosis, prescription, notes, follow_up_date)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(appointment_id) DO UPDATE
+    SET diagnosis = excluded.diagnosis, prescription = excluded.prescription,
+        notes = excluded.notes, follow_up_date = excluded.follow_up_date,
+        updated_at = CURRENT_TIMESTAMP
+'''
+
+SQL_APPOINTMENT_DETAIL = '''
+    SELECT a.*, u.name as patient_name, p.age, p.gender, p.contact,
+           p.blood_group, p.address
+    FROM appointments a
+    JOIN patients p ON a.patient_id = p.patient_id
+    JOIN users u ON p.user_id = u.user_id
+    WHERE a.appointment_id = ?
+'''
+
+SQL_TREATMENT = '''
+    SELECT * FROM treatments WHERE appointment_id = ?
+'''
+
+SQL_UPSERT_AVAILABILITY = '''
+    INSERT INTO doctor_availability (doctor_id, date, start_time, end_time, is_available)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(doctor_id, date, start_time) DO UPDATE
+    SET end_time = excluded.end_time, is_available = excluded.is_available
+'''
+
+SQL_AVAILABILITY_RANGE = '''
+    SELECT * FROM doctor_availability
+    WHERE doctor_id = ? AND date BETWEEN ? AND ?
+    ORDER BY date, start_time
+'''
+
+SQL_PATIENT_DETAIL = '''
+    SELECT p.*, u.name, u.email
+    FROM patients p
+    JOIN users u ON p.user_id = u.user_id
+    WHERE p.patient_id = ?
+'''
+
+SQL_PATIENT_HISTORY = '''
+    SELECT a.*, t.diagnosis, t.prescription, t.notes, t.follow_up_date
+    FROM appointments a
+    LEFT JOIN treatments t ON a.appointment_id = t.appointment_id
+    WHERE a.patient_id = ? AND a.doctor_id = ?
+    ORDER BY a.appointment_date DESC, a.appointment_time DESC
+'''
+
+APPOINTMENTS_PAGE_SIZE = 50
+
 
 def doctor_required(f):
     """Decorator to require doctor role"""
@@ -32,76 +142,36 @@ def dashboard():
     """Doctor dashboard"""
     db = get_db()
 
-    # Get doctor ID
-    doctor = db.execute('SELECT doctor_id FROM doctors WHERE user_id = ?',
-                        (current_user.user_id,)).fetchone()
+    doctor_id = current_user.doctor_id
 
-    if not doctor:
+    if doctor_id is None:
         flash('Doctor profile not found', 'danger')
         return redirect(url_for('auth.logout'))
 
-    doctor_id = doctor['doctor_id']
-
     # Get today's date
-    today = datetime.now().strftime('%Y-%m-%d')
-    week_later = (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d')
+    today = today_iso()
+    week_later = week_later_iso()
 
     # Upcoming appointments (today and next 7 days)
-    upcoming_appointments = db.execute('''
-        SELECT a.*, u.name as patient_name, p.contact, p.age, p.gender
-        FROM appointments a
-        JOIN patients p ON a.patient_id = p.patient_id
-        JOIN users u ON p.user_id = u.user_id
-        WHERE a.doctor_id = ? AND a.appointment_date >= ? AND a.appointment_date <= ?
-        AND a.status != 'Cancelled'
-        ORDER BY a.appointment_date, a.appointment_time
-    ''', (doctor_id, today, week_later)).fetchall()
-
-    # Today's appointments
-    today_appointments = db.execute('''
-        SELECT a.*, u.name as patient_name, p.contact, p.age, p.gender
-        FROM appointments a
-        JOIN patients p ON a.patient_id = p.patient_id
-        JOIN users u ON p.user_id = u.user_id
-        WHERE a.doctor_id = ? AND a.appointment_date = ?
-        AND a.status != 'Cancelled'
-        ORDER BY a.appointment_time
-    ''', (doctor_id, today)).fetchall()
-
-    # Assigned patients (unique patients with appointments)
-    assigned_patients = db.execute('''
-        SELECT DISTINCT p.patient_id, u.name, p.age, p.gender, p.contact, p.blood_group,
-               COUNT(a.appointment_id) as total_appointments
-        FROM patients p
-        JOIN users u ON p.user_id = u.user_id
-        JOIN appointments a ON p.patient_id = a.patient_id
-        WHERE a.doctor_id = ?
-        GROUP BY p.patient_id
-        ORDER BY u.name
-    ''', (doctor_id,)).fetchall()
-
-    # Statistics
-    total_appointments = db.execute('''
-        SELECT COUNT(*) as count FROM appointments WHERE doctor_id = ?
-    ''', (doctor_id,)).fetchone()['count']
-
-    completed_appointments = db.execute('''
-        SELECT COUNT(*) as count FROM appointments 
-        WHERE doctor_id = ? AND status = 'Completed'
-    ''', (doctor_id,)).fetchone()['count']
-
-    pending_appointments = db.execute('''
-        SELECT COUNT(*) as count FROM appointments 
-        WHERE doctor_id = ? AND status = 'Booked' AND appointment_date >= ?
-    ''', (doctor_id, today)).fetchone()['count']
+    upcoming_appointments = db.execute(SQL_DASHBOARD_UPCOMING, (doctor_id, today, week_later)).fetchall()
+
+    # Today's appointments, taken from the upcoming list (already in time order)
+    today_appointments = [apt for apt in upcoming_appointments if apt['appointment_date'] == today]
+
+    # Assigned patients (unique patients with appointments), with counts
+    # maintained by triggers on appointments
+    assigned_patients = db.execute(SQL_ASSIGNED_PATIENTS, (doctor_id,)).fetchall()
+
+    # Statistics, counted in one pass over the doctor's appointments
+    stats = db.execute(SQL_DASHBOARD_STATS, (today, doctor_id)).fetchone()
 
     return render_template('doctor/dashboard.html',
                            upcoming_appointments=upcoming_appointments,
                            today_appointments=today_appointments,
                            assigned_patients=assigned_patients,
-                           total_appointments=total_appointments,
-                           completed_appointments=completed_appointments,
-                           pending_appointments=pending_appointments)
+                           total_appointments=stats['total'],
+                           completed_appointments=stats['completed'],
+                           pending_appointments=stats['pending'])
 
 
 @doctor_bp.route('/appointments')
@@ -111,21 +181,15 @@ def appointments():
     """View all appointments"""
     db = get_db()
 
-    doctor = db.execute('SELECT doctor_id FROM doctors WHERE user_id = ?',
-                        (current_user.user_id,)).fetchone()
-    doctor_id = doctor['doctor_id']
+    # Keyset pagination, newest first, as in the admin appointments list
+    all_appointments, next_cursor, is_first_page = keyset_page(
+        db, SQL_APPOINTMENTS_LIST, SQL_APPOINTMENTS_PAGE,
+        (current_user.doctor_id,), APPOINTMENTS_PAGE_SIZE)
 
-    # Get all appointments
-    all_appointments = db.execute('''
-        SELECT a.*, u.name as patient_name, p.contact, p.age, p.gender, p.blood_group
-        FROM appointments a
-        JOIN patients p ON a.patient_id = p.patient_id
-        JOIN users u ON p.user_id = u.user_id
-        WHERE a.doctor_id = ?
-        ORDER BY a.appointment_date DESC, a.appointment_time DESC
-    ''', (doctor_id,)).fetchall()
-
-    return render_template('doctor/appointments.html', appointments=all_appointments)
+    return render_template('doctor/appointments.html',
+                           appointments=all_appointments,
+                           next_cursor=next_cursor,
+                           is_first_page=is_first_page)
 
 
 @doctor_bp.route('/appointment/update/<int:appointment_id>', methods=['GET', 'POST'])
@@ -143,31 +207,14 @@ def update_appointment(appointment_id):
         follow_up_date = request.form.get('follow_up_date')
 
         try:
+            # Both writes below run in one transaction holding the write lock
+            db.execute('BEGIN IMMEDIATE')
+
             # Update appointment status
-            db.execute('''
-                UPDATE appointments SET status = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE appointment_id = ?
-            ''', (status, appointment_id))
-
-            # Check if treatment record exists
-            existing_treatment = db.execute('''
-                SELECT treatment_id FROM treatments WHERE appointment_id = ?
-            ''', (appointment_id,)).fetchone()
-
-            if existing_treatment:
-                # Update existing treatment
-                db.execute('''
-                    UPDATE treatments 
-                    SET diagnosis = ?, prescription = ?, notes = ?, 
-                        follow_up_date = ?, updated_at = CURRENT_TIMESTAMP
-                    WHERE appointment_id = ?
-                ''', (diagnosis, prescription, notes, follow_up_date, appointment_id))
-            else:
-                # Insert new treatment record
-                db.execute('''
-                    INSERT INTO treatments (appointment_id, diagnosis, prescription, notes, follow_up_date)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (appointment_id, diagnosis, prescription, notes, follow_up_date))
+            db.execute(SQL_UPDATE_APPOINTMENT_STATUS, (status, appointment_id))
+
+            # Create the treatment record, or update it if one exists already
+            db.execute(SQL_UPSERT_TREATMENT, (appointment_id, diagnosis, prescription, notes, follow_up_date))
 
             db.commit()
             flash('Appointment and treatment updated successfully!', 'success')
@@ -178,19 +225,10 @@ def update_appointment(appointment_id):
             flash(f'Error: {str(e)}', 'danger')
 
     # Get appointment details
-    appointment = db.execute('''
-        SELECT a.*, u.name as patient_name, p.age, p.gender, p.contact, 
-               p.blood_group, p.address
-        FROM appointments a
-        JOIN patients p ON a.patient_id = p.patient_id
-        JOIN users u ON p.user_id = u.user_id
-        WHERE a.appointment_id = ?
-    ''', (appointment_id,)).fetchone()
+    appointment = db.execute(SQL_APPOINTMENT_DETAIL, (appointment_id,)).fetchone()
 
     # Get existing treatment if any
-    treatment = db.execute('''
-        SELECT * FROM treatments WHERE appointment_id = ?
-    ''', (appointment_id,)).fetchone()
+    treatment = db.execute(SQL_TREATMENT, (appointment_id,)).fetchone()
 
     return render_template('doctor/update_treatment.html',
                            appointment=appointment,
@@ -204,9 +242,7 @@ def availability():
     """Manage doctor availability"""
     db = get_db()
 
-    doctor = db.execute('SELECT doctor_id FROM doctors WHERE user_id = ?',
-                        (current_user.user_id,)).fetchone()
-    doctor_id = doctor['doctor_id']
+    doctor_id = current_user.doctor_id
 
     if request.method == 'POST':
         # Get form data
@@ -216,33 +252,18 @@ def availability():
         availabilities = request.form.getlist('is_available[]')
 
         try:
-            for i in range(len(dates)):
-                date = dates[i]
-                start_time = start_times[i]
-                end_time = end_times[i]
-                is_available = 1 if str(i) in availabilities else 0
-
-                # Check if exists
-                existing = db.execute('''
-                    SELECT availability_id FROM doctor_availability
-                    WHERE doctor_id = ? AND date = ? AND start_time = ?
-                ''', (doctor_id, date, start_time)).fetchone()
-
-                if existing:
-                    # Update
-                    db.execute('''
-                        UPDATE doctor_availability
-                        SET end_time = ?, is_available = ?
-                        WHERE availability_id = ?
-                    ''', (end_time, is_available, existing['availability_id']))
-                else:
-                    # Insert
-                    db.execute('''
-                        INSERT INTO doctor_availability (doctor_id, date, start_time, end_time, is_available)
-                        VALUES (?, ?, ?, ?, ?)
-                    ''', (doctor_id, date, start_time, end_time, is_available))
+            rows = [
+                (doctor_id, dates[i], start_times[i], end_times[i], 1 if str(i) in availabilities else 0)
+                for i in range(len(dates))
+            ]
+
+            db.execute('BEGIN IMMEDIATE')
+            # Insert new slots and update existing ones, matched on the
+            # table's UNIQUE(doctor_id, date, start_time) constraint
+            db.executemany(SQL_UPSERT_AVAILABILITY, rows)
 
             db.commit()
+            cache.delete_memoized(active_doctors)
             flash('Availability updated successfully!', 'success')
             return redirect(url_for('doctor.availability'))
 
@@ -250,20 +271,14 @@ def availability():
             db.rollback()
             flash(f'Error: {str(e)}', 'danger')
 
-    # Get next 7 days availability
-    availabilities = []
-    for i in range(7):
-        date = (datetime.now() + timedelta(days=i)).strftime('%Y-%m-%d')
-        day_availability = db.execute('''
-            SELECT * FROM doctor_availability
-            WHERE doctor_id = ? AND date = ?
-            ORDER BY start_time
-        ''', (doctor_id, date)).fetchall()
-
-        availabilities.append({
-            'date': date,
-            'slots': day_availability
-        })
+    # Get next 7 days availability in one range query, grouped by date
+    today = date.today()
+    dates = [(today + timedelta(days=i)).isoformat() for i in range(7)]
+    slots_by_date = {}
+    for slot in db.execute(SQL_AVAILABILITY_RANGE, (doctor_id, dates[0], dates[-1])):
+        slots_by_date.setdefault(slot['date'], []).append(slot)
+
+    availabilities = [{'date': day, 'slots': slots_by_date.get(day, [])} for day in dates]
 
     return render_template('doctor/availability.html', availabilities=availabilities)
 
@@ -275,26 +290,13 @@ def patient_history(patient_id):
     """View complete treatment history of a patient"""
     db = get_db()
 
-    doctor = db.execute('SELECT doctor_id FROM doctors WHERE user_id = ?',
-                        (current_user.user_id,)).fetchone()
-    doctor_id = doctor['doctor_id']
+    doctor_id = current_user.doctor_id
 
     # Get patient details
-    patient = db.execute('''
-        SELECT p.*, u.name, u.email
-        FROM patients p
-        JOIN users u ON p.user_id = u.user_id
-        WHERE p.patient_id = ?
-    ''', (patient_id,)).fetchone()
+    patient = db.execute(SQL_PATIENT_DETAIL, (patient_id,)).fetchone()
 
     # Get all appointments and treatments for this patient with this doctor
-    history = db.execute('''
-        SELECT a.*, t.diagnosis, t.prescription, t.notes, t.follow_up_date
-        FROM appointments a
-        LEFT JOIN treatments t ON a.appointment_id = t.appointment_id
-        WHERE a.patient_id = ? AND a.doctor_id = ?
-        ORDER BY a.appointment_date DESC, a.appointment_time DESC
-    ''', (patient_id, doctor_id)).fetchall()
+    history = db.execute(SQL_PATIENT_HISTORY, (patient_id, doctor_id)).fetchall()
 
     return render_template('doctor/patient_history.html',
                            patient=patient,
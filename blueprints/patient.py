@@ -3,14 +3,177 @@ Patient Blueprint - Dashboard, Appointments, Booking, Profile
 blueprints/patient.py
 """
 
+import sqlite3
 from flask import Blueprint, render_template, redirect, url_for, flash, request
-from flask_login import login_required, current_user
+from flask_login import login_required, current_user, login_user
 from functools import wraps
-from database import get_db
-from datetime import datetime, timedelta
+from blueprints import keyset_page, today_iso, week_later_iso
+from database import get_db, get_departments, active_doctors, iter_rows
+from models import User
+from datetime import date, timedelta
 
 patient_bp = Blueprint('patient', __name__)
 
+# SQL for the views below, built once at import so every request hands
+# sqlite3 the same string for its statement cache
+SQL_DASHBOARD_UPCOMING = '''
+    SELECT a.*,
+           u.name AS doctor_name,
+           doc.specialization,
+           dept.name AS dept_name
+    FROM appointments a
+    JOIN doctors doc ON a.doctor_id = doc.doctor_id
+    JOIN users u ON doc.user_id = u.user_id
+    LEFT JOIN departments dept ON doc.dept_id = dept.dept_id
+    WHERE a.patient_id = ?
+      AND a.appointment_date >= ?
+      AND a.status != 'Cancelled'
+    ORDER BY a.appointment_date, a.appointment_time
+    LIMIT 5
+'''
+
+SQL_DASHBOARD_STATS = '''
+    SELECT COUNT(*) AS total,
+           COALESCE(SUM(CASE WHEN status = 'Completed' THEN 1 ELSE 0 END), 0) AS completed
+    FROM appointments
+    WHERE patient_id = ?
+'''
+
+SQL_DOCTOR_DETAIL = '''
+    SELECT d.*, u.name, u.email, dept.name AS dept_name
+    FROM doctors d
+    JOIN users u ON d.user_id = u.user_id
+    LEFT JOIN departments dept ON d.dept_id = dept.dept_id
+    WHERE d.doctor_id = ?
+'''
+
+SQL_AVAILABILITY_RANGE = '''
+    SELECT *
+    FROM doctor_availability
+    WHERE doctor_id = ? AND date BETWEEN ? AND ? AND is_available = 1
+    ORDER BY date, start_time
+'''
+
+SQL_SLOT_TAKEN = '''
+    SELECT 1
+    FROM appointments
+    WHERE doctor_id = ?
+      AND appointment_date = ?
+      AND appointment_time = ?
+      AND status NOT IN ('Cancelled', 'Rescheduled')
+    LIMIT 1
+'''
+
+SQL_SLOT_AVAILABLE = '''
+    SELECT 1
+    FROM doctor_availability
+    WHERE doctor_id = ?
+      AND date = ?
+      AND is_available = 1
+      AND ? BETWEEN start_time AND end_time
+    LIMIT 1
+'''
+
+SQL_INSERT_APPOINTMENT = '''
+    INSERT INTO appointments
+        (patient_id, doctor_id, appointment_date, appointment_time, status, reason)
+    VALUES (?, ?, ?, ?, 'Booked', ?)
+'''
+
+SQL_BOOKABLE_DOCTORS = '''
+    SELECT d.*, u.name, dept.name AS dept_name
+    FROM doctors d
+    JOIN users u ON d.user_id = u.user_id
+    LEFT JOIN departments dept ON d.dept_id = dept.dept_id
+    WHERE d.status = 'active'
+    ORDER BY u.name
+'''
+
+SQL_APPOINTMENTS_LIST = '''
+    SELECT a.*,
+           u.name AS doctor_name,
+           doc.specialization,
+           dept.name AS dept_name,
+           doc.contact
+    FROM appointments a
+    JOIN doctors doc ON a.doctor_id = doc.doctor_id
+    JOIN users u ON doc.user_id = u.user_id
+    LEFT JOIN departments dept ON doc.dept_id = dept.dept_id
+    WHERE a.patient_id = ?
+    ORDER BY a.appointment_date DESC, a.appointment_time DESC, a.appointment_id DESC
+    LIMIT ?
+'''
+
+# Same as SQL_APPOINTMENTS_LIST, continuing after the keyset of the last row shown
+SQL_APPOINTMENTS_PAGE = '''
+    SELECT a.*,
+           u.name AS doctor_name,
+           doc.specialization,
+           dept.name AS dept_name,
+           doc.contact
+    FROM appointments a
+    JOIN doctors doc ON a.doctor_id = doc.doctor_id
+    JOIN users u ON doc.user_id = u.user_id
+    LEFT JOIN departments dept ON doc.dept_id = dept.dept_id
+    WHERE a.patient_id = ?
+      AND (a.appointment_date, a.appointment_time, a.appointment_id) < (?, ?, ?)
+    ORDER BY a.appointment_date DESC, a.appointment_time DESC, a.appointment_id DESC
+    LIMIT ?
+'''
+
+SQL_OWN_APPOINTMENT = '''
+    SELECT appointment_date
+    FROM appointments
+    WHERE appointment_id = ? AND patient_id = ?
+'''
+
+SQL_CANCEL_APPOINTMENT = '''
+    UPDATE appointments
+    SET status = 'Cancelled', updated_at = CURRENT_TIMESTAMP
+    WHERE appointment_id = ?
+'''
+
+SQL_HISTORY = '''
+    SELECT a.*,
+           u.name AS doctor_name,
+           doc.specialization,
+           dept.name AS dept_name,
+           t.diagnosis,
+           t.prescription,
+           t.notes,
+           t.follow_up_date
+    FROM appointments a
+    JOIN doctors doc ON a.doctor_id = doc.doctor_id
+    JOIN users u ON doc.user_id = u.user_id
+    LEFT JOIN departments dept ON doc.dept_id = dept.dept_id
+    LEFT JOIN treatments t ON a.appointment_id = t.appointment_id
+    WHERE a.patient_id = ?
+      AND a.status = 'Completed'
+    ORDER BY a.appointment_date DESC, a.appointment_time DESC
+'''
+
+SQL_PROFILE = '''
+    SELECT p.*, u.name, u.email
+    FROM patients p
+    JOIN users u ON p.user_id = u.user_id
+    WHERE p.user_id = ?
+'''
+
+SQL_UPDATE_USER = '''
+    UPDATE users
+    SET name = ?, email = ?
+    WHERE user_id = ?
+'''
+
+SQL_UPDATE_PATIENT = '''
+    UPDATE patients
+    SET age = ?, gender = ?, contact = ?, address = ?,
+        blood_group = ?, emergency_contact = ?
+    WHERE user_id = ?
+'''
+
+APPOINTMENTS_PAGE_SIZE = 50
+
 
 def patient_required(f):
     """Require patient role"""
@@ -32,58 +195,28 @@ def dashboard():
     """Patient dashboard"""
     db = get_db()
 
-    patient = db.execute(
-        'SELECT patient_id FROM patients WHERE user_id = ?',
-        (current_user.user_id,)
-    ).fetchone()
+    patient_id = current_user.patient_id
 
-    if not patient:
+    if patient_id is None:
         flash('Patient profile not found', 'danger')
         return redirect(url_for('auth.logout'))
 
-    patient_id = patient['patient_id']
-
     # Departments list
-    departments = db.execute(
-        'SELECT * FROM departments ORDER BY name'
-    ).fetchall()
+    departments = get_departments()
 
     # Upcoming appointments
-    today = datetime.now().strftime('%Y-%m-%d')
-    upcoming_appointments = db.execute('''
-        SELECT a.*, 
-               u.name AS doctor_name, 
-               doc.specialization, 
-               dept.name AS dept_name
-        FROM appointments a
-        JOIN doctors doc ON a.doctor_id = doc.doctor_id
-        JOIN users u ON doc.user_id = u.user_id
-        LEFT JOIN departments dept ON doc.dept_id = dept.dept_id
-        WHERE a.patient_id = ? 
-          AND a.appointment_date >= ? 
-          AND a.status != 'Cancelled'
-        ORDER BY a.appointment_date, a.appointment_time
-        LIMIT 5
-    ''', (patient_id, today)).fetchall()
-
-    # Stats
-    total_appointments = db.execute(
-        'SELECT COUNT(*) AS count FROM appointments WHERE patient_id = ?',
-        (patient_id,)
-    ).fetchone()['count']
-
-    completed_appointments = db.execute('''
-        SELECT COUNT(*) AS count 
-        FROM appointments 
-        WHERE patient_id = ? AND status = 'Completed'
-    ''', (patient_id,)).fetchone()['count']
+    today = today_iso()
+    upcoming_appointments = db.execute(SQL_DASHBOARD_UPCOMING, (patient_id, today)).fetchall()
+
+    # Stats, counted in one pass over the patient's appointments
+    stats = db.execute(SQL_DASHBOARD_STATS, (patient_id,)).fetchone()
 
     return render_template(
         'patient/dashboard.html',
         departments=departments,
         upcoming_appointments=upcoming_appointments,
-        total_appointments=total_appointments,
-        completed_appointments=completed_appointments
+        total_appointments=stats['total'],
+        completed_appointments=stats['completed']
     )
 
 
@@ -92,47 +225,11 @@ def dashboard():
 @patient_required
 def doctors():
     """List all doctors with availability"""
-    db = get_db()
-
     dept_id = request.args.get('dept_id', type=int)
 
-    today = datetime.now().strftime('%Y-%m-%d')
-    week_later = (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d')
-
-    if dept_id:
-        doctors_list = db.execute('''
-            SELECT d.*, u.name, u.email, dept.name AS dept_name,
-                   COUNT(DISTINCT da.date) AS available_days
-            FROM doctors d
-            JOIN users u ON d.user_id = u.user_id
-            LEFT JOIN departments dept ON d.dept_id = dept.dept_id
-            LEFT JOIN doctor_availability da 
-                ON d.doctor_id = da.doctor_id
-               AND da.date BETWEEN ? AND ? 
-               AND da.is_available = 1
-            WHERE d.status = 'active' AND d.dept_id = ?
-            GROUP BY d.doctor_id
-            ORDER BY u.name
-        ''', (today, week_later, dept_id)).fetchall()
-    else:
-        doctors_list = db.execute('''
-            SELECT d.*, u.name, u.email, dept.name AS dept_name,
-                   COUNT(DISTINCT da.date) AS available_days
-            FROM doctors d
-            JOIN users u ON d.user_id = u.user_id
-            LEFT JOIN departments dept ON d.dept_id = dept.dept_id
-            LEFT JOIN doctor_availability da 
-                ON d.doctor_id = da.doctor_id
-               AND da.date BETWEEN ? AND ? 
-               AND da.is_available = 1
-            WHERE d.status = 'active'
-            GROUP BY d.doctor_id
-            ORDER BY u.name
-        ''', (today, week_later)).fetchall()
-
-    departments = db.execute(
-        'SELECT * FROM departments ORDER BY name'
-    ).fetchall()
+    doctors_list = active_doctors(dept_id, today_iso(), week_later_iso())
+
+    departments = get_departments()
 
     return render_template(
         'patient/doctors.html',
@@ -149,28 +246,23 @@ def doctor_availability(doctor_id):
     """Show doctor availability"""
     db = get_db()
 
-    doctor = db.execute('''
-        SELECT d.*, u.name, u.email, dept.name AS dept_name
-        FROM doctors d
-        JOIN users u ON d.user_id = u.user_id
-        LEFT JOIN departments dept ON d.dept_id = dept.dept_id
-        WHERE d.doctor_id = ?
-    ''', (doctor_id,)).fetchone()
+    doctor = db.execute(SQL_DOCTOR_DETAIL, (doctor_id,)).fetchone()
 
-    availabilities = []
-    for i in range(7):
-        date = (datetime.now() + timedelta(days=i)).strftime('%Y-%m-%d')
-        slots = db.execute('''
-            SELECT *
-            FROM doctor_availability
-            WHERE doctor_id = ? AND date = ? AND is_available = 1
-            ORDER BY start_time
-        ''', (doctor_id, date)).fetchall()
+    # Next 7 days in one range query, grouped by date
+    today = date.today()
+    days = [today + timedelta(days=i) for i in range(7)]
+    dates = [day.isoformat() for day in days]
+    slots_by_date = {}
+    for slot in db.execute(SQL_AVAILABILITY_RANGE, (doctor_id, dates[0], dates[-1])):
+        slots_by_date.setdefault(slot['date'], []).append(slot)
 
+    availabilities = []
+    for day, day_iso in zip(days, dates):
+        slots = slots_by_date.get(day_iso)
         if slots:
             availabilities.append({
-                'date': date,
-                'day_name': datetime.strptime(date, '%Y-%m-%d').strftime('%A'),
+                'date': day_iso,
+                'day_name': day.strftime('%A'),
                 'slots': slots
             })
 
@@ -188,11 +280,7 @@ def book_appointment():
     """Book an appointment"""
     db = get_db()
 
-    patient = db.execute(
-        'SELECT patient_id FROM patients WHERE user_id = ?',
-        (current_user.user_id,)
-    ).fetchone()
-    patient_id = patient['patient_id']
+    patient_id = current_user.patient_id
 
     if request.method == 'POST':
         doctor_id = request.form.get('doctor_id')
@@ -204,65 +292,49 @@ def book_appointment():
             flash('All fields are required.', 'danger')
             return redirect(url_for('patient.book_appointment'))
 
-        if appointment_date < datetime.now().strftime('%Y-%m-%d'):
+        if appointment_date < today_iso():
             flash('Cannot book past appointments.', 'danger')
             return redirect(url_for('patient.book_appointment'))
 
         # Double-booking check
-        existing = db.execute('''
-            SELECT *
-            FROM appointments
-            WHERE doctor_id = ?
-              AND appointment_date = ?
-              AND appointment_time = ?
-              AND status NOT IN ('Cancelled', 'Rescheduled')
-        ''', (doctor_id, appointment_date, appointment_time)).fetchone()
+        existing = db.execute(SQL_SLOT_TAKEN, (doctor_id, appointment_date, appointment_time)).fetchone()
 
         if existing:
             flash('Time slot already booked.', 'danger')
             return redirect(url_for('patient.book_appointment'))
 
-        # Check doctor availability
-        available = db.execute('''
-            SELECT *
-            FROM doctor_availability
-            WHERE doctor_id = ?
-              AND date = ?
-              AND is_available = 1
-              AND time(?) BETWEEN time(start_time) AND time(end_time)
-        ''', (doctor_id, appointment_date, appointment_time)).fetchone()
+        # Check doctor availability. Times are stored as zero-padded HH:MM (the
+        # form's time inputs), so plain string comparison orders them correctly
+        available = db.execute(SQL_SLOT_AVAILABLE, (doctor_id, appointment_date, appointment_time)).fetchone()
 
         if not available:
             flash('Doctor is not available at this time.', 'danger')
             return redirect(url_for('patient.book_appointment'))
 
         try:
-            db.execute('''
-                INSERT INTO appointments 
-                    (patient_id, doctor_id, appointment_date, appointment_time, status, reason)
-                VALUES (?, ?, ?, ?, 'Booked', ?)
-            ''', (patient_id, doctor_id, appointment_date, appointment_time, reason))
+            db.execute(SQL_INSERT_APPOINTMENT,
+                       (patient_id, doctor_id, appointment_date, appointment_time, reason))
 
             db.commit()
             flash('Appointment booked!', 'success')
             return redirect(url_for('patient.appointments'))
 
+        except sqlite3.IntegrityError as e:
+            db.rollback()
+            if 'UNIQUE constraint failed' in str(e):
+                # Another booking took the slot after the check above
+                flash('Time slot already booked.', 'danger')
+                return redirect(url_for('patient.book_appointment'))
+            # NOT NULL, CHECK or foreign key failures are ordinary errors
+            flash(f'Error: {e}', 'danger')
+
         except Exception as e:
             db.rollback()
             flash(f'Error: {e}', 'danger')
 
-    doctors = db.execute('''
-        SELECT d.*, u.name, dept.name AS dept_name
-        FROM doctors d
-        JOIN users u ON d.user_id = u.user_id
-        LEFT JOIN departments dept ON d.dept_id = dept.dept_id
-        WHERE d.status = 'active'
-        ORDER BY u.name
-    ''').fetchall()
+    doctors = db.execute(SQL_BOOKABLE_DOCTORS).fetchall()
 
-    departments = db.execute(
-        'SELECT * FROM departments ORDER BY name'
-    ).fetchall()
+    departments = get_departments()
 
     return render_template(
         'patient/book_appointment.html',
@@ -278,29 +350,16 @@ def appointments():
     """View all patient appointments"""
     db = get_db()
 
-    patient = db.execute(
-        'SELECT patient_id FROM patients WHERE user_id = ?',
-        (current_user.user_id,)
-    ).fetchone()
-    patient_id = patient['patient_id']
-
-    all_appointments = db.execute('''
-        SELECT a.*, 
-               u.name AS doctor_name, 
-               doc.specialization, 
-               dept.name AS dept_name, 
-               doc.contact
-        FROM appointments a
-        JOIN doctors doc ON a.doctor_id = doc.doctor_id
-        JOIN users u ON doc.user_id = u.user_id
-        LEFT JOIN departments dept ON doc.dept_id = dept.dept_id
-        WHERE a.patient_id = ?
-        ORDER BY a.appointment_date DESC, a.appointment_time DESC
-    ''', (patient_id,)).fetchall()
+    # Keyset pagination, newest first, as in the admin appointments list
+    all_appointments, next_cursor, is_first_page = keyset_page(
+        db, SQL_APPOINTMENTS_LIST, SQL_APPOINTMENTS_PAGE,
+        (current_user.patient_id,), APPOINTMENTS_PAGE_SIZE)
 
     return render_template(
         'patient/appointments.html',
-        appointments=all_appointments
+        appointments=all_appointments,
+        next_cursor=next_cursor,
+        is_first_page=is_first_page
     )
 
 
@@ -311,31 +370,19 @@ def cancel_appointment(appointment_id):
     """Cancel appointment"""
     db = get_db()
 
-    patient = db.execute(
-        'SELECT patient_id FROM patients WHERE user_id = ?',
-        (current_user.user_id,)
-    ).fetchone()
-
     try:
-        appointment = db.execute('''
-            SELECT * 
-            FROM appointments 
-            WHERE appointment_id = ? AND patient_id = ?
-        ''', (appointment_id, patient['patient_id'])).fetchone()
+        # Ownership is checked in the same lookup via the session's patient_id
+        appointment = db.execute(SQL_OWN_APPOINTMENT, (appointment_id, current_user.patient_id)).fetchone()
 
         if not appointment:
             flash('Appointment not found.', 'danger')
             return redirect(url_for('patient.appointments'))
 
-        if appointment['appointment_date'] < datetime.now().strftime('%Y-%m-%d'):
+        if appointment['appointment_date'] < today_iso():
             flash('Cannot cancel past appointments.', 'danger')
             return redirect(url_for('patient.appointments'))
 
-        db.execute('''
-            UPDATE appointments 
-            SET status = 'Cancelled', updated_at = CURRENT_TIMESTAMP
-            WHERE appointment_id = ?
-        ''', (appointment_id,))
+        db.execute(SQL_CANCEL_APPOINTMENT, (appointment_id,))
 
         db.commit()
         flash('Appointment cancelled.', 'success')
@@ -354,30 +401,9 @@ def history():
     """Appointment history with treatments"""
     db = get_db()
 
-    patient = db.execute(
-        'SELECT patient_id FROM patients WHERE user_id = ?',
-        (current_user.user_id,)
-    ).fetchone()
-    patient_id = patient['patient_id']
-
-    history_records = db.execute('''
-        SELECT a.*, 
-               u.name AS doctor_name, 
-               doc.specialization, 
-               dept.name AS dept_name,
-               t.diagnosis, 
-               t.prescription, 
-               t.notes, 
-               t.follow_up_date
-        FROM appointments a
-        JOIN doctors doc ON a.doctor_id = doc.doctor_id
-        JOIN users u ON doc.user_id = u.user_id
-        LEFT JOIN departments dept ON doc.dept_id = dept.dept_id
-        LEFT JOIN treatments t ON a.appointment_id = t.appointment_id
-        WHERE a.patient_id = ? 
-          AND a.status = 'Completed'
-        ORDER BY a.appointment_date DESC, a.appointment_time DESC
-    ''', (patient_id,)).fetchall()
+    patient_id = current_user.patient_id
+
+    history_records = iter_rows(db.execute(SQL_HISTORY, (patient_id,)))
 
     return render_template(
         'patient/history.html',
@@ -392,12 +418,7 @@ def edit_profile():
     """Edit profile"""
     db = get_db()
 
-    patient = db.execute('''
-        SELECT p.*, u.name, u.email
-        FROM patients p
-        JOIN users u ON p.user_id = u.user_id
-        WHERE p.user_id = ?
-    ''', (current_user.user_id,)).fetchone()
+    patient = db.execute(SQL_PROFILE, (current_user.user_id,)).fetchone()
 
     if request.method == 'POST':
         name = request.form.get('name')
@@ -410,20 +431,16 @@ def edit_profile():
         emergency_contact = request.form.get('emergency_contact')
 
         try:
-            db.execute('''
-                UPDATE users 
-                SET name = ?, email = ? 
-                WHERE user_id = ?
-            ''', (name, email, current_user.user_id))
-
-            db.execute('''
-                UPDATE patients 
-                SET age = ?, gender = ?, contact = ?, address = ?, 
-                    blood_group = ?, emergency_contact = ?
-                WHERE user_id = ?
-            ''', (age, gender, contact, address, blood_group, emergency_contact, current_user.user_id))
+            db.execute('BEGIN IMMEDIATE')
+            db.execute(SQL_UPDATE_USER, (name, email, current_user.user_id))
+
+            db.execute(SQL_UPDATE_PATIENT,
+                       (age, gender, contact, address, blood_group, emergency_contact, current_user.user_id))
 
             db.commit()
+            # Refresh the identity stored in the session so the new name shows up
+            login_user(User(current_user.user_id, name, email, None, current_user.role,
+                            patient_id=current_user.patient_id))
             flash('Profile updated.', 'success')
             return redirect(url_for('patient.dashboard'))
 
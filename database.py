@@ -3,30 +3,230 @@ Database initialization and management
 Creates all tables and seed data programmatically
 """
 
+import os
+import queue
 import sqlite3
+from collections import namedtuple
+from functools import lru_cache
 from flask import g
-from werkzeug.security import generate_password_hash
-from datetime import datetime, timedelta
+from flask_caching import Cache
+from models import hash_password
+from datetime import date, timedelta
 
-DATABASE = 'hospital.db'
+# Path or file: URI of the database, overridable for deployments and tests
+DATABASE = os.environ.get('HMS_DATABASE', 'hospital.db')
+
+# Idle connections kept open between requests. LIFO hands out the most
+# recently returned connection, whose page cache is warmest; the matching
+# cap on idle connections is the waitress thread count.
+POOL_SIZE = 8
+_pool = queue.LifoQueue(maxsize=POOL_SIZE)
+
+# Shared application cache; bound to the app in app.py
+cache = Cache()
+
+# Version of the seed data; recorded in schema_version once applied
+SEED_VERSION = 1
+
+# Upper bound on rows per multi-row INSERT issued by insert_many()
+INSERT_BATCH = 1000
+
+
+def _row_getitem(self, key):
+    """Index by position, or by column name as sqlite3.Row allows"""
+    if isinstance(key, str):
+        return getattr(self, key)
+    return tuple.__getitem__(self, key)
+
+
+@lru_cache(maxsize=256)
+def _row_class(description):
+    """The row class for a result with this cursor.description"""
+    base = namedtuple('Row', [column[0] for column in description], rename=True)
+    return type('Row', (base,), {'__slots__': (), '__getitem__': _row_getitem})
+
+
+def row_factory(cursor, row):
+    """Build rows as namedtuples that also accept row['column'] lookups
+
+    Templates read columns as attributes (apt.status); on sqlite3.Row each
+    of those first fails getattr before Jinja falls back to indexing.
+    """
+    return _row_class(cursor.description)._make(row)
+
+
+def dict_row_factory(cursor, row):
+    """Build rows as plain dicts, for results that are cached and so pickled"""
+    return dict(zip([column[0] for column in cursor.description], row))
+
+
+def _configure(db):
+    """Apply the connection settings every connection to DATABASE uses"""
+    # WAL lets readers proceed while a write is in flight; NORMAL sync is
+    # safe under WAL and avoids an fsync on every commit. mmap serves reads
+    # from a memory map of the file instead of read() copies, and
+    # foreign_keys enforces the REFERENCES clauses declared in the schema.
+    db.executescript('''
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA busy_timeout=5000;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA cache_size=-20000;
+        PRAGMA mmap_size=134217728;
+        PRAGMA foreign_keys=ON;
+    ''')
+
+
+def _connect():
+    """Open a configured connection for the pool"""
+    # Pooled connections move between worker threads, hence
+    # check_same_thread=False. Each is checked out by a single request until
+    # teardown, so no connection is ever used by two threads at once.
+    # cached_statements leaves room for every statement the blueprints issue.
+    # isolation_level=None leaves transactions to the code: single statements
+    # autocommit, and every multi-statement write opens BEGIN IMMEDIATE.
+    db = sqlite3.connect(DATABASE, uri=True, cached_statements=512,
+                         check_same_thread=False, isolation_level=None)
+    db.row_factory = row_factory
+    _configure(db)
+    return db
 
 
 def get_db():
-    """Get database connection"""
-    db = getattr(g, '_database', None)
-    if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
-        db.row_factory = sqlite3.Row
+    """Get the current request's database connection, checked out of the pool"""
+    try:
+        return g._database
+    except AttributeError:
+        pass
+    try:
+        db = _pool.get_nowait()
+    except queue.Empty:
+        db = _connect()
+    g._database = db
     return db
 
 
+@cache.cached(timeout=600, key_prefix='departments_list')
+def get_departments():
+    """Departments for the dropdowns, as dicts so the cache can pickle them"""
+    cursor = get_db().cursor()
+    cursor.row_factory = dict_row_factory
+    return cursor.execute('SELECT dept_id, name FROM departments ORDER BY name').fetchall()
+
+
+# Doctor listing for patients, with the number of available days in a window
+SQL_ACTIVE_DOCTORS = '''
+    SELECT d.*, u.name, u.email, dept.name AS dept_name,
+           (SELECT COUNT(DISTINCT da.date)
+            FROM doctor_availability da
+            WHERE da.doctor_id = d.doctor_id
+              AND da.date BETWEEN ? AND ?
+              AND da.is_available = 1) AS available_days
+    FROM doctors d
+    JOIN users u ON d.user_id = u.user_id
+    LEFT JOIN departments dept ON d.dept_id = dept.dept_id
+    WHERE d.status = 'active'
+    ORDER BY u.name
+'''
+
+# Same as SQL_ACTIVE_DOCTORS, limited to one department
+SQL_ACTIVE_DOCTORS_BY_DEPT = '''
+    SELECT d.*, u.name, u.email, dept.name AS dept_name,
+           (SELECT COUNT(DISTINCT da.date)
+            FROM doctor_availability da
+            WHERE da.doctor_id = d.doctor_id
+              AND da.date BETWEEN ? AND ?
+              AND da.is_available = 1) AS available_days
+    FROM doctors d
+    JOIN users u ON d.user_id = u.user_id
+    LEFT JOIN departments dept ON d.dept_id = dept.dept_id
+    WHERE d.status = 'active' AND d.dept_id = ?
+    ORDER BY u.name
+'''
+
+
+@cache.memoize(timeout=60)
+def active_doctors(dept_id, today, week_later):
+    """Active doctors with their available days this week, as dicts for the cache
+
+    The listing is the same for every patient. Views that change doctors or
+    their availability clear it with cache.delete_memoized(active_doctors).
+    """
+    cursor = get_db().cursor()
+    cursor.row_factory = dict_row_factory
+    if dept_id:
+        return cursor.execute(SQL_ACTIVE_DOCTORS_BY_DEPT, (today, week_later, dept_id)).fetchall()
+    return cursor.execute(SQL_ACTIVE_DOCTORS, (today, week_later)).fetchall()
+
+
+def iter_rows(cursor, size=200):
+    """Yield a cursor's rows in fetchmany batches rather than one fetchall list"""
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+
+def _max_params(conn):
+    """The connection's limit on bound parameters per statement"""
+    # Connection.getlimit() is Python 3.11+; older versions assume the
+    # smallest default SQLite has shipped with (999, before 3.32)
+    if hasattr(conn, 'getlimit'):
+        return conn.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+    return 999
+
+
+def insert_many(cursor, sql_prefix, rows):
+    """Insert rows with multi-row INSERT ... VALUES (...), (...) statements
+
+    sql_prefix is the statement up to VALUES, e.g. 'INSERT INTO t (a, b)'.
+    Rows go in chunks of at most INSERT_BATCH rows, further capped so that
+    no statement binds more parameters than the connection allows.
+    """
+    if not rows:
+        return
+    width = len(rows[0])
+    row_template = '(' + ', '.join('?' * width) + ')'
+    per_statement = max(1, min(INSERT_BATCH, _max_params(cursor.connection) // width))
+    for start in range(0, len(rows), per_statement):
+        chunk = rows[start:start + per_statement]
+        cursor.execute(f"{sql_prefix} VALUES {', '.join([row_template] * len(chunk))}",
+                       [value for row in chunk for value in row])
+
+
+def close_db(exception=None):
+    """Teardown hook: return the request's connection to the pool
+
+    Anything left uncommitted is rolled back first. Safe to call more than
+    once, and when the request never touched the database.
+    """
+    db = g.pop('_database', None)
+    if db is None:
+        return
+    if db.in_transaction:
+        db.rollback()
+    try:
+        _pool.put_nowait(db)
+    except queue.Full:
+        db.close()
+
+
 def init_db():
-    """Initialize database with all tables and seed data"""
-    conn = sqlite3.connect(DATABASE)
+    """Initialize database with all tables and seed data
+
+    Returns True if this call seeded a new database.
+    """
+    conn = sqlite3.connect(DATABASE, uri=True, isolation_level=None)
+    _configure(conn)
     cursor = conn.cursor()
 
-    # Users Table
-    cursor.execute('''
+    # All tables in one script and one transaction, so a fresh database
+    # commits its schema once
+    cursor.executescript('''
+        BEGIN;
+
+        -- Users Table
         CREATE TABLE IF NOT EXISTS users (
             user_id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT NOT NULL,
@@ -35,21 +235,17 @@ def init_db():
             role TEXT NOT NULL CHECK(role IN ('admin', 'doctor', 'patient')),
             status TEXT DEFAULT 'active' CHECK(status IN ('active', 'blacklisted')),
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+        );
 
-    # Departments Table
-    cursor.execute('''
+        -- Departments Table
         CREATE TABLE IF NOT EXISTS departments (
             dept_id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT UNIQUE NOT NULL,
             description TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+        );
 
-    # Doctors Table
-    cursor.execute('''
+        -- Doctors Table
         CREATE TABLE IF NOT EXISTS doctors (
             doctor_id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER UNIQUE NOT NULL,
@@ -62,11 +258,9 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
             FOREIGN KEY (dept_id) REFERENCES departments(dept_id)
-        )
-    ''')
+        );
 
-    # Doctor Availability Table
-    cursor.execute('''
+        -- Doctor Availability Table
         CREATE TABLE IF NOT EXISTS doctor_availability (
             availability_id INTEGER PRIMARY KEY AUTOINCREMENT,
             doctor_id INTEGER NOT NULL,
@@ -76,11 +270,9 @@ def init_db():
             is_available BOOLEAN DEFAULT 1,
             FOREIGN KEY (doctor_id) REFERENCES doctors(doctor_id) ON DELETE CASCADE,
             UNIQUE(doctor_id, date, start_time)
-        )
-    ''')
+        );
 
-    # Patients Table
-    cursor.execute('''
+        -- Patients Table
         CREATE TABLE IF NOT EXISTS patients (
             patient_id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER UNIQUE NOT NULL,
@@ -93,11 +285,9 @@ def init_db():
             status TEXT DEFAULT 'active' CHECK(status IN ('active', 'blacklisted')),
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
-        )
-    ''')
+        );
 
-    # Appointments Table
-    cursor.execute('''
+        -- Appointments Table
         CREATE TABLE IF NOT EXISTS appointments (
             appointment_id INTEGER PRIMARY KEY AUTOINCREMENT,
             patient_id INTEGER NOT NULL,
@@ -110,11 +300,9 @@ def init_db():
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (patient_id) REFERENCES patients(patient_id) ON DELETE CASCADE,
             FOREIGN KEY (doctor_id) REFERENCES doctors(doctor_id) ON DELETE CASCADE
-        )
-    ''')
+        );
 
-    # Treatment Table
-    cursor.execute('''
+        -- Treatment Table
         CREATE TABLE IF NOT EXISTS treatments (
             treatment_id INTEGER PRIMARY KEY AUTOINCREMENT,
             appointment_id INTEGER UNIQUE NOT NULL,
@@ -125,26 +313,153 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (appointment_id) REFERENCES appointments(appointment_id) ON DELETE CASCADE
-        )
+        );
+
+        -- Seed versions already applied; see seed_data()
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY
+        );
+
+        COMMIT;
+    ''')
+
+    # Indexes on foreign key / filter columns. users.email, doctors.user_id,
+    # patients.user_id and doctor_availability(doctor_id, date, ...) are
+    # already covered by the implicit indexes behind their UNIQUE constraints.
+    cursor.execute('CREATE INDEX IF NOT EXISTS ix_doctors_dept ON doctors(dept_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS ix_appt_date ON appointments(appointment_date)')
+
+    # Per-doctor and per-patient appointment lists filter on the owner and sort
+    # by date and time; these serve both without a separate sort step. They
+    # replace the single-column owner indexes, which are prefixes of them.
+    # The doctor index also carries status and patient_id, so the dashboard
+    # stats are answered from the index alone and the status filter and
+    # patient join key are checked before the table row is read.
+    cursor.execute('SELECT 1 FROM sqlite_master WHERE name = ?', ('ix_appt_doctor_window',))
+    is_new = cursor.fetchone() is None
+    cursor.execute('CREATE INDEX IF NOT EXISTS ix_appt_doctor_window '
+                   'ON appointments(doctor_id, appointment_date, appointment_time, status, patient_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS ix_appt_patient_date '
+                   'ON appointments(patient_id, appointment_date, appointment_time)')
+    cursor.execute('DROP INDEX IF EXISTS ix_appt_doctor')
+    cursor.execute('DROP INDEX IF EXISTS ix_appt_doctor_date')
+    cursor.execute('DROP INDEX IF EXISTS ix_appt_patient')
+    if is_new:
+        cursor.execute('ANALYZE appointments')
+
+    # At most one live booking per doctor slot, so two concurrent bookings
+    # cannot both pass the check in book_appointment
+    try:
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS ux_appt_slot
+            ON appointments(doctor_id, appointment_date, appointment_time)
+            WHERE status NOT IN ('Cancelled', 'Rescheduled')
+        ''')
+    except sqlite3.IntegrityError:
+        print("Warning: duplicate bookings exist; slot uniqueness is not enforced")
+
+    # Running per-doctor patient list for the doctor dashboard, kept up to date
+    # by triggers instead of grouping the doctor's appointments on every view.
+    # Table, triggers and backfill commit together, so an interrupted start
+    # leaves no half-built table behind.
+    cursor.execute('SELECT 1 FROM sqlite_master WHERE name = ?', ('doctor_patients',))
+    is_new = cursor.fetchone() is None
+    # Count appointments booked before the table was added
+    backfill = '''
+        INSERT INTO doctor_patients (doctor_id, patient_id, total_appointments)
+        SELECT doctor_id, patient_id, COUNT(*) FROM appointments
+        GROUP BY doctor_id, patient_id;
+    ''' if is_new else ''
+    cursor.executescript(f'''
+        BEGIN IMMEDIATE;
+        CREATE TABLE IF NOT EXISTS doctor_patients (
+            doctor_id INTEGER NOT NULL,
+            patient_id INTEGER NOT NULL,
+            total_appointments INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (doctor_id, patient_id),
+            FOREIGN KEY (doctor_id) REFERENCES doctors(doctor_id) ON DELETE CASCADE,
+            FOREIGN KEY (patient_id) REFERENCES patients(patient_id) ON DELETE CASCADE
+        ) WITHOUT ROWID;
+        -- The primary key leads with doctor_id; this serves the patient side
+        -- of the foreign keys (cascading deletes from patients)
+        CREATE INDEX IF NOT EXISTS ix_doctor_patients_patient ON doctor_patients(patient_id);
+        CREATE TRIGGER IF NOT EXISTS doctor_patients_ai AFTER INSERT ON appointments BEGIN
+            INSERT INTO doctor_patients (doctor_id, patient_id, total_appointments)
+            VALUES (new.doctor_id, new.patient_id, 1)
+            ON CONFLICT (doctor_id, patient_id) DO UPDATE
+            SET total_appointments = total_appointments + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS doctor_patients_ad AFTER DELETE ON appointments BEGIN
+            UPDATE doctor_patients SET total_appointments = total_appointments - 1
+            WHERE doctor_id = old.doctor_id AND patient_id = old.patient_id;
+            DELETE FROM doctor_patients
+            WHERE doctor_id = old.doctor_id AND patient_id = old.patient_id
+              AND total_appointments <= 0;
+        END;
+        {backfill}
+        COMMIT;
     ''')
 
-    conn.commit()
+    # Full-text indexes behind the admin search boxes, kept in sync by triggers.
+    # The trigram tokenizer lets FTS5 serve the substring LIKE '%term%' filters.
+    # Each index is created and filled in one transaction, as above.
+    fts_indexes = [
+        ('users_fts', 'users', 'user_id', 'name'),
+        ('doctors_fts', 'doctors', 'doctor_id', 'specialization'),
+        ('patients_fts', 'patients', 'patient_id', 'contact'),
+    ]
+    for fts, table, key, column in fts_indexes:
+        cursor.execute('SELECT 1 FROM sqlite_master WHERE name = ?', (fts,))
+        is_new = cursor.fetchone() is None
+        # Index rows that existed before the search table was added
+        rebuild = f"INSERT INTO {fts} ({fts}) VALUES ('rebuild');" if is_new else ''
+        cursor.executescript(f'''
+            BEGIN IMMEDIATE;
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {column}, content='{table}', content_rowid='{key}', tokenize='trigram'
+            );
+            CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts} (rowid, {column}) VALUES (new.{key}, new.{column});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {column}) VALUES ('delete', old.{key}, old.{column});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column} ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {column}) VALUES ('delete', old.{key}, old.{column});
+                INSERT INTO {fts} (rowid, {column}) VALUES (new.{key}, new.{column});
+            END;
+            {rebuild}
+            COMMIT;
+        ''')
 
     # Seed initial data
-    seed_data(conn)
+    seeded = seed_data(conn)
 
     conn.close()
+    return seeded
 
 
 def seed_data(conn):
-    """Insert initial seed data"""
+    """Insert initial seed data; returns True if anything was inserted"""
     cursor = conn.cursor()
 
+    # A seeded database carries its version row, so restarts stop here
+    cursor.execute('SELECT 1 FROM schema_version WHERE version = ?', (SEED_VERSION,))
+    if cursor.fetchone():
+        return False
+
     # Check if admin exists
-    cursor.execute("SELECT * FROM users WHERE email = ?", ('admin@hospital.com',))
+    cursor.execute("SELECT 1 FROM users WHERE email = ? LIMIT 1", ('admin@hospital.com',))
     if not cursor.fetchone():
+        # Hash before taking the write lock; each Argon2 hash takes a while.
+        # The sample doctors share a password, so it is hashed once.
+        admin_password = hash_password('admin123')
+        doctor_password = hash_password('doctor123')
+
+        # All seed rows go in one transaction, committed once at the end
+        cursor.execute('BEGIN IMMEDIATE')
+
         # Create admin user
-        admin_password = generate_password_hash('admin123')
         cursor.execute('''
             INSERT INTO users (name, email, password, role, status)
             VALUES (?, ?, ?, ?, ?)
@@ -152,19 +467,18 @@ def seed_data(conn):
 
         # Create departments
         departments = [
-            ('Cardiology', 'Heart and cardiovascular system'),
-            ('Neurology', 'Brain and nervous system'),
-            ('Orthopedics', 'Bones and joints'),
-            ('Pediatrics', 'Children healthcare'),
-            ('Dermatology', 'Skin conditions'),
-            ('General Medicine', 'General health issues'),
-            ('ENT', 'Ear, Nose, and Throat'),
-            ('Ophthalmology', 'Eye care')
+            (1, 'Cardiology', 'Heart and cardiovascular system'),
+            (2, 'Neurology', 'Brain and nervous system'),
+            (3, 'Orthopedics', 'Bones and joints'),
+            (4, 'Pediatrics', 'Children healthcare'),
+            (5, 'Dermatology', 'Skin conditions'),
+            (6, 'General Medicine', 'General health issues'),
+            (7, 'ENT', 'Ear, Nose, and Throat'),
+            (8, 'Ophthalmology', 'Eye care')
         ]
 
-        cursor.executemany('''
-            INSERT INTO departments (name, description) VALUES (?, ?)
-        ''', departments)
+        insert_many(cursor, 'INSERT INTO departments (dept_id, name, description)', departments)
+        dept_ids = {name: dept_id for dept_id, name, _ in departments}
 
         # Create sample doctors
         doctor_data = [
@@ -174,41 +488,51 @@ def seed_data(conn):
             ('Dr. Emily Davis', 'emily.d@hospital.com', 'Pediatrics', '9876543213', 'MD Pediatrics', 8),
         ]
 
-        for name, email, spec, contact, qual, exp in doctor_data:
-            password = generate_password_hash('doctor123')
-            cursor.execute('''
-                INSERT INTO users (name, email, password, role, status)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (name, email, password, 'doctor', 'active'))
-
-            user_id = cursor.lastrowid
-
-            # Get department ID
-            cursor.execute('SELECT dept_id FROM departments WHERE name = ?', (spec,))
-            dept = cursor.fetchone()
-            dept_id = dept[0] if dept else None
-
-            cursor.execute('''
-                INSERT INTO doctors (user_id, specialization, dept_id, contact, qualification, experience, status)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (user_id, spec, dept_id, contact, qual, exp, 'active'))
-
-            doctor_id = cursor.lastrowid
-
-            # Add availability for next 7 days
-            for i in range(7):
-                date = (datetime.now() + timedelta(days=i)).strftime('%Y-%m-%d')
-                time_slots = [
-                    ('09:00', '12:00'),
-                    ('14:00', '17:00')
-                ]
-                for start, end in time_slots:
-                    cursor.execute('''
-                        INSERT INTO doctor_availability (doctor_id, date, start_time, end_time, is_available)
-                        VALUES (?, ?, ?, ?, ?)
-                    ''', (doctor_id, date, start, end, 1))
+        # Availability for the next 7 days, the same dates for every doctor
+        today = date.today()
+        dates = [(today + timedelta(days=i)).isoformat() for i in range(7)]
+        time_slots = [
+            ('09:00', '12:00'),
+            ('14:00', '17:00')
+        ]
+
+        # Doctor users first, then their doctor rows, each in one batch.
+        # Generated ids are read back by email and user_id, since executemany
+        # does not report a lastrowid per row.
+        cursor.executemany('''
+            INSERT INTO users (name, email, password, role, status)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(name, email, doctor_password, 'doctor', 'active')
+              for name, email, *_ in doctor_data])
 
+        cursor.execute("SELECT email, user_id FROM users WHERE role = 'doctor'")
+        user_ids = dict(cursor.fetchall())
+
+        cursor.executemany('''
+            INSERT INTO doctors (user_id, specialization, dept_id, contact, qualification, experience, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(user_ids[email], spec, dept_ids.get(spec), contact, qual, exp, 'active')
+              for name, email, spec, contact, qual, exp in doctor_data])
+
+        # Every doctor gets every slot: bind the dates x time slots once and
+        # let SQLite cross join them with the doctors table
+        slots = [(day, start, end) for day in dates for start, end in time_slots]
+        cursor.execute('''
+            WITH slot(date, start_time, end_time) AS (VALUES %s)
+            INSERT INTO doctor_availability (doctor_id, date, start_time, end_time, is_available)
+            SELECT d.doctor_id, s.date, s.start_time, s.end_time, 1
+            FROM doctors d CROSS JOIN slot s
+        ''' % ', '.join(['(?, ?, ?)'] * len(slots)),
+            [value for slot in slots for value in slot])
+
+        cursor.execute('INSERT OR IGNORE INTO schema_version (version) VALUES (?)', (SEED_VERSION,))
         conn.commit()
         print("Seed data created successfully!")
         print("Admin credentials: admin@hospital.com / admin123")
-        print("Doctor credentials: john.smith@hospital.com / doctor123")
\ No newline at end of file
+        print("Doctor credentials: john.smith@hospital.com / doctor123")
+        return True
+
+    # Seeded before the version row existed; record it so later starts
+    # skip the users lookup
+    cursor.execute('INSERT OR IGNORE INTO schema_version (version) VALUES (?)', (SEED_VERSION,))
+    return False
@@ -2,28 +2,108 @@
 Models for Flask-Login and database operations
 """
 
+from concurrent.futures import ThreadPoolExecutor
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 from flask_login import UserMixin
+from werkzeug.security import check_password_hash
+
+# Version of the identity packed into the session by User.get_id(); bump it
+# whenever the format changes so that older sessions are forced to log in again
+SESSION_VERSION = 2
+
+_password_hasher = PasswordHasher()
+
+# Hashing and verification run on a small dedicated pool so at most two
+# Argon2 computations (64 MiB each) are in flight however many request
+# threads are waiting.
+# argon2-cffi releases the GIL while hashing, so threads are enough here.
+_hash_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='password-hash')
+
+# Fixed Argon2id hash (default parameters) checked when a login email is
+# unknown, so that response time does not reveal which emails are registered
+_DUMMY_PASSWORD_HASH = ('$argon2id$v=19$m=65536,t=3,p=4$n94njRxU1rg/lpyZw+2iGw'
+                        '$gpf9TAwB/wQYJh+dtDNN/rOonDzgotEfOQymcK201AY')
 
 
 class User(UserMixin):
     """User model for Flask-Login"""
 
-    def __init__(self, user_id, name, email, password, role):
+    # UserMixin has no __slots__, so instances still get a __dict__, but it
+    # is never populated: every attribute set below lives in a slot
+    __slots__ = ('id', 'user_id', 'name', 'email', 'password', 'role', 'doctor_id', 'patient_id',
+                 '_is_admin', '_is_doctor', '_is_patient')
+
+    def __init__(self, user_id, name, email, password, role, doctor_id=None, patient_id=None):
         self.id = user_id
         self.user_id = user_id
         self.name = name
         self.email = email
         self.password = password
         self.role = role
+        # The role never changes for a loaded user, so the checks are done once
+        self._is_admin = role == 'admin'
+        self._is_doctor = role == 'doctor'
+        self._is_patient = role == 'patient'
+        self.doctor_id = doctor_id
+        self.patient_id = patient_id
 
     def get_id(self):
-        return str(self.user_id)
+        # Profile id is the doctor_id or patient_id matching the role, if any.
+        # Name goes last since it is the only field that may contain '|'
+        profile_id = self.doctor_id if self.role == 'doctor' else self.patient_id
+        return (f'{SESSION_VERSION}|{self.user_id}|{self.role}|'
+                f'{"" if profile_id is None else profile_id}|{self.name}')
+
+    @classmethod
+    def from_session_id(cls, session_id):
+        """Rebuild a User from get_id() output without querying the database"""
+        parts = session_id.split('|', 4)
+        if len(parts) != 5 or parts[0] != str(SESSION_VERSION):
+            return None
+        _, user_id, role, profile_id, name = parts
+        profile_id = int(profile_id) if profile_id else None
+        if role == 'doctor':
+            return cls(int(user_id), name, None, None, role, doctor_id=profile_id)
+        return cls(int(user_id), name, None, None, role, patient_id=profile_id)
 
     def is_admin(self):
-        return self.role == 'admin'
+        return self._is_admin
 
     def is_doctor(self):
-        return self.role == 'doctor'
+        return self._is_doctor
 
     def is_patient(self):
-        return self.role == 'patient'
\ No newline at end of file
+        return self._is_patient
+
+
+def hash_password(password):
+    """Hash a password with Argon2id on the hashing pool"""
+    return _hash_pool.submit(_password_hasher.hash, password).result()
+
+
+def verify_password(password_hash, password):
+    """Check a password against its stored hash
+
+    Hashes created before the switch to Argon2 are werkzeug hashes and are
+    still accepted. Pass None as the hash for an unknown user.
+    """
+    if password_hash is None:
+        password_hash = _DUMMY_PASSWORD_HASH
+    if not password_hash.startswith('$argon2'):
+        return check_password_hash(password_hash, password)
+    return _hash_pool.submit(_verify_argon2, password_hash, password).result()
+
+
+def _verify_argon2(password_hash, password):
+    try:
+        return _password_hasher.verify(password_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+
+def password_needs_rehash(password_hash):
+    """Whether a stored hash should be replaced by a fresh Argon2id hash"""
+    if not password_hash.startswith('$argon2'):
+        return True
+    return _password_hasher.check_needs_rehash(password_hash)
\ No newline at end of file